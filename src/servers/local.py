@@ -89,4 +89,10 @@ async def main():
 
 if __name__ == "__main__":
     logger.info("Starting guMCP local stdio server")
-    asyncio.run(main())
+    # Prefer uvloop's faster event loop when it is installed
+    try:
+        import uvloop
+    except ImportError:
+        asyncio.run(main())
+    else:
+        uvloop.run(main())
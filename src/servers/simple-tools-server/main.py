@@ -2,22 +2,42 @@ import logging
 from typing import Optional
 import sys
 import os
-import json
-import uuid
+import itertools
 import time
+import functools
+from pathlib import Path
+from collections import OrderedDict
 
+import orjson
 import mcp.types as types
 from mcp.server import NotificationOptions, Server
 from mcp.server.models import InitializationOptions
 
-# Add project root to Python path for imports
-project_root = os.path.abspath(
-    os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
-)
-sys.path.insert(0, project_root)
-sys.path.insert(0, os.path.join(project_root, "src"))
 
-from src.auth.factory import create_auth_client
+def _dumps(obj) -> str:
+    """Serialize a tool result to JSON, stringifying non-str keys like json.dumps"""
+    return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
+# Project root (guMCP/), added to sys.path on first use of the auth factory
+_PROJECT_ROOT = Path(__file__).resolve().parents[3]
+
+_create_auth_client = None
+
+
+def _auth_client_factory(*args, **kwargs):
+    """Import the auth factory on first use and create an auth client"""
+    global _create_auth_client
+    if _create_auth_client is None:
+        for path in (str(_PROJECT_ROOT), str(_PROJECT_ROOT / "src")):
+            if path not in sys.path:
+                sys.path.insert(0, path)
+
+        from src.auth.factory import create_auth_client
+
+        _create_auth_client = create_auth_client
+    return _create_auth_client(*args, **kwargs)
+
 
 # Configure logging
 logging.basicConfig(
@@ -25,15 +45,162 @@ logging.basicConfig(
 )
 logger = logging.getLogger("simple-tools-server")
 
-user_data_stores = {}
+
+class _LRUStore(OrderedDict):
+    """
+    OrderedDict that evicts its least recently used entry once over capacity.
+    Inserts and setdefault both count as a use of the key.
+    """
+
+    def __init__(self, maxsize: int):
+        super().__init__()
+        self.maxsize = maxsize
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        if len(self) > self.maxsize:
+            self.popitem(last=False)
+
+    def setdefault(self, key, default=None):
+        value = super().setdefault(key, default)
+        self.move_to_end(key)
+        return value
+
+
+_DEFAULT_MAX_USERS = 10000
+
+
+def _max_users_from_env() -> int:
+    """Read the data store capacity from SIMPLE_TOOLS_MAX_USERS (at least 1)"""
+    raw = os.environ.get("SIMPLE_TOOLS_MAX_USERS", str(_DEFAULT_MAX_USERS))
+    try:
+        return max(1, int(raw))
+    except ValueError:
+        logger.warning(
+            "Invalid SIMPLE_TOOLS_MAX_USERS %r, using %d", raw, _DEFAULT_MAX_USERS
+        )
+        return _DEFAULT_MAX_USERS
+
+
+# Per-user data stores, bounded so transient users don't grow memory forever
+user_data_stores: _LRUStore = _LRUStore(_max_users_from_env())
+
+# Resolved API keys keyed by (user_id, api_key), stored with a monotonic timestamp.
+# Bounded like the data stores, since every remote api_key seen gets an entry
+_CREDS_CACHE: _LRUStore = _LRUStore(1024)
+_CREDS_TTL = 300.0
+
+# Response ids are opaque correlation tokens: a per-process random prefix plus a
+# monotonic counter keeps them unique without a urandom call per request
+_ID_PREFIX = os.urandom(2).hex()
+_ID_COUNTER = itertools.count()
+
+
+def _short_id(kind: str) -> str:
+    """Return a short unique id for a tool response, e.g. store_1a2b000001"""
+    return f"{kind}_{_ID_PREFIX}{next(_ID_COUNTER):06x}"
+
+
+def _text(payload: str) -> types.TextContent:
+    """Wrap a known-safe string in TextContent, skipping Pydantic validation"""
+    return types.TextContent.model_construct(type="text", text=payload)
+
+
+# Static prompt and tool listings, built once at import
+_PROMPTS: list[types.Prompt] = [
+    types.Prompt(
+        name="system",
+        description="Sample system prompt",
+    ),
+]
+
+_SYSTEM_PROMPT_RESULT = types.GetPromptResult(
+    description="Sample system prompt",
+    messages=[
+        {
+            "role": "user",
+            "content": {"type": "text", "text": "\nSample system prompt\n"},
+        }
+    ],
+)
+
+# The schemas below are static literals, so skip Pydantic validation for them
+_TOOLS: list[types.Tool] = [
+    types.Tool.model_construct(
+        name="store_data",
+        description="Store a key-value pair in the server",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "key": {"type": "string"},
+                "value": {"type": "string"},
+            },
+            "required": ["key", "value"],
+        },
+        outputSchema={
+            "type": "array",
+            "items": {"type": "string"},
+            "description": "Array of JSON strings containing the store operation result",
+            "examples": [
+                '{"id": "store_1a2b000001", "status": "success", "action": "store", "key": "test_key", "value": "test_value", "message": "Stored \'test_key\' with value: test_value", "authenticated": true, "timestamp": 1640995200}'
+            ],
+        },
+    ),
+    types.Tool.model_construct(
+        name="retrieve_data",
+        description="Retrieve a value by its key",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "key": {"type": "string"},
+            },
+            "required": ["key"],
+        },
+        outputSchema={
+            "type": "array",
+            "items": {"type": "string"},
+            "description": "Array of JSON strings containing the retrieved value or error message",
+            "examples": [
+                '{"id": "retrieve_1a2b000002", "status": "success", "action": "retrieve", "key": "test_key", "value": "test_value", "message": "Value for \'test_key\': test_value", "timestamp": 1640995260}',
+                '{"id": "retrieve_1a2b000003", "status": "not_found", "action": "retrieve", "key": "nonexistent_key", "message": "Key \'nonexistent_key\' not found", "timestamp": 1640995260}',
+            ],
+        },
+    ),
+    types.Tool.model_construct(
+        name="list_data",
+        description="List all stored key-value pairs",
+        inputSchema={
+            "type": "object",
+            "properties": {},
+        },
+        outputSchema={
+            "type": "array",
+            "items": {"type": "string"},
+            "description": "Array of JSON strings containing all stored key-value pairs or no data message. formatted_list is omitted when more than 100 items are stored",
+            "examples": [
+                '{"id": "list_1a2b000004", "status": "success", "action": "list", "data": {"test_key": "test_value", "another_key": "another_value"}, "count": 2, "message": "Found 2 items", "formatted_list": "- test_key: test_value\\n- another_key: another_value", "timestamp": 1640995320}',
+                '{"id": "list_1a2b000005", "status": "empty", "action": "list", "data": {}, "count": 0, "message": "No data stored", "timestamp": 1640995320}',
+            ],
+        },
+    ),
+]
+
+
+# Note: the cache holds on to up to 128 auth clients, and with them the remote
+# api_keys they were created with, until they are evicted
+@functools.lru_cache(maxsize=128)
+def _get_auth_client(api_key: Optional[str] = None):
+    """Return a memoized auth client so tool calls don't rebuild it"""
+    return _auth_client_factory(api_key=api_key)
 
 
 def authenticate_and_save_credentials(user_id):
     """Authenticate with simple-tools service and save API key"""
-    logger.info(f"Starting simple-tools authentication for user {user_id}...")
+    logger.info("Starting simple-tools authentication for user %s...", user_id)
 
     # Get auth client
-    auth_client = create_auth_client()
+    auth_client = _auth_client_factory()
 
     # Prompt user for API key if running locally
     api_key = input("Please enter your Simple Tools API key: ").strip()
@@ -45,20 +212,28 @@ def authenticate_and_save_credentials(user_id):
     auth_client.save_user_credentials("simple-tools", user_id, {"api_key": api_key})
 
     logger.info(
-        f"Simple Tools API key saved for user {user_id}. You can now run the server."
+        "Simple Tools API key saved for user %s. You can now run the server.", user_id
     )
     return api_key
 
 
 async def get_simple_tools_credentials(user_id, api_key=None):
     """Get simple-tools API key for the specified user"""
+    cache_key = (user_id, api_key)
+    cached = _CREDS_CACHE.get(cache_key)
+    if cached is not None:
+        if time.monotonic() - cached[1] < _CREDS_TTL:
+            return cached[0]
+        del _CREDS_CACHE[cache_key]
+
     # Get auth client
-    auth_client = create_auth_client(api_key=api_key)
+    auth_client = _get_auth_client(api_key=api_key)
 
     # Get credentials for this user
     credentials_data = auth_client.get_user_credentials("simple-tools", user_id)
 
     def handle_missing_credentials():
+        _CREDS_CACHE.pop(cache_key, None)
         error_str = f"Simple Tools API key not found for user {user_id}."
         if os.environ.get("ENVIRONMENT", "local") == "local":
             error_str += " Please run authentication first."
@@ -68,15 +243,123 @@ async def get_simple_tools_credentials(user_id, api_key=None):
     if not credentials_data:
         handle_missing_credentials()
 
-    api_key = (
+    resolved_api_key = (
         credentials_data.get("api_key")
         if not isinstance(credentials_data, str)
         else credentials_data
     )
-    if not api_key:
+    if not resolved_api_key:
         handle_missing_credentials()
 
-    return api_key
+    _CREDS_CACHE[cache_key] = (resolved_api_key, time.monotonic())
+    return resolved_api_key
+
+
+# list_data omits formatted_list once a store holds more items than this
+_FORMATTED_LIST_MAX_ITEMS = 100
+
+# Sentinel for data store lookups, distinct from any stored value
+_MISSING = object()
+
+
+def _store_data(data_store: dict[str, str], arguments: dict | None, now: int) -> dict:
+    """Store a key-value pair in the user's data store"""
+    if not arguments:
+        raise ValueError("Missing arguments")
+
+    key = arguments.get("key")
+    value = arguments.get("value")
+
+    # Empty strings are legitimate keys and values; absent or non-str ones are not
+    if not isinstance(key, str) or not isinstance(value, str):
+        raise ValueError("Missing key or value")
+
+    # Update user-specific server state in place
+    data_store[key] = value
+
+    return {
+        "id": _short_id("store"),
+        "status": "success",
+        "action": "store",
+        "key": key,
+        "value": value,
+        "message": f"Stored '{key}' with value: {value}",
+        "authenticated": True,
+        "timestamp": now,
+    }
+
+
+def _retrieve_data(
+    data_store: dict[str, str], arguments: dict | None, now: int
+) -> dict:
+    """Retrieve a value by its key from the user's data store"""
+    if not arguments:
+        raise ValueError("Missing arguments")
+
+    key = arguments.get("key")
+
+    if not isinstance(key, str):
+        raise ValueError("Missing key")
+
+    result = {
+        "id": _short_id("retrieve"),
+        "action": "retrieve",
+        "key": key,
+        "timestamp": now,
+    }
+
+    value = data_store.get(key, _MISSING)
+    if value is _MISSING:
+        result["status"] = "not_found"
+        result["message"] = f"Key '{key}' not found"
+    else:
+        result["status"] = "success"
+        result["value"] = value
+        result["message"] = f"Value for '{key}': {value}"
+
+    return result
+
+
+def _list_data(data_store: dict[str, str], arguments: dict | None, now: int) -> dict:
+    """List all key-value pairs in the user's data store"""
+    if not data_store:
+        return {
+            "id": _short_id("list"),
+            "status": "empty",
+            "action": "list",
+            "data": {},
+            "count": 0,
+            "message": "No data stored",
+            "timestamp": now,
+        }
+
+    count = len(data_store)
+    result = {
+        "id": _short_id("list"),
+        "status": "success",
+        "action": "list",
+        "data": data_store,
+        "count": count,
+        "message": f"Found {count} items",
+        "timestamp": now,
+    }
+
+    # Large stores would otherwise be serialized twice; "data" already has it all
+    if count <= _FORMATTED_LIST_MAX_ITEMS:
+        result["formatted_list"] = "\n".join(
+            f"- {k}: {v}" for k, v in data_store.items()
+        )
+
+    return result
+
+
+# Tool name -> handler; each handler takes the request timestamp and returns the
+# JSON-serializable result dict
+_TOOL_HANDLERS = {
+    "store_data": _store_data,
+    "retrieve_data": _retrieve_data,
+    "list_data": _list_data,
+}
 
 
 def create_server(
@@ -90,23 +373,15 @@ def create_server(
     server.config = config
 
     if user_id:
-        server.user_id = user_id
         # Initialize user data store if needed
-        if user_id not in user_data_stores:
-            user_data_stores[user_id] = {}
+        user_data_stores.setdefault(user_id, {})
 
     @server.list_prompts()
     async def handle_list_prompts() -> list[types.Prompt]:
         """List available prompts"""
-        current_user = getattr(server, "user_id", None)
-        logger.info(f"Listing prompts for user: {current_user}")
+        logger.info("Listing prompts for user: %s", user_id)
 
-        return [
-            types.Prompt(
-                name="system",
-                description="Sample system prompt",
-            ),
-        ]
+        return _PROMPTS
 
     @server.get_prompt()
     async def handle_get_prompt(
@@ -114,16 +389,7 @@ def create_server(
     ) -> types.GetPromptResult:
         """Get a specific prompt with arguments"""
         if name == "system":
-            content = f"""
-Sample system prompt
-"""
-
-            return types.GetPromptResult(
-                description=f"Sample system prompt",
-                messages=[
-                    {"role": "user", "content": {"type": "text", "text": content}}
-                ],
-            )
+            return _SYSTEM_PROMPT_RESULT
 
         raise ValueError(f"Unknown prompt: {name}")
 
@@ -133,68 +399,9 @@ Sample system prompt
         List available tools.
         Each tool specifies its arguments using JSON Schema validation.
         """
-        current_user = getattr(server, "user_id", None)
-        logger.info(f"Listing tools for user: {current_user}")
-
-        return [
-            types.Tool(
-                name="store_data",
-                description="Store a key-value pair in the server",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "key": {"type": "string"},
-                        "value": {"type": "string"},
-                    },
-                    "required": ["key", "value"],
-                },
-                outputSchema={
-                    "type": "array",
-                    "items": {"type": "string"},
-                    "description": "Array of JSON strings containing the store operation result",
-                    "examples": [
-                        '{"id": "store_12345678", "status": "success", "action": "store", "key": "test_key", "value": "test_value", "message": "Stored \'test_key\' with value: test_value", "authenticated": true, "timestamp": 1640995200}'
-                    ],
-                },
-            ),
-            types.Tool(
-                name="retrieve_data",
-                description="Retrieve a value by its key",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "key": {"type": "string"},
-                    },
-                    "required": ["key"],
-                },
-                outputSchema={
-                    "type": "array",
-                    "items": {"type": "string"},
-                    "description": "Array of JSON strings containing the retrieved value or error message",
-                    "examples": [
-                        '{"id": "retrieve_87654321", "status": "success", "action": "retrieve", "key": "test_key", "value": "test_value", "message": "Value for \'test_key\': test_value", "timestamp": 1640995260}',
-                        '{"id": "retrieve_11223344", "status": "not_found", "action": "retrieve", "key": "nonexistent_key", "message": "Key \'nonexistent_key\' not found", "timestamp": 1640995260}',
-                    ],
-                },
-            ),
-            types.Tool(
-                name="list_data",
-                description="List all stored key-value pairs",
-                inputSchema={
-                    "type": "object",
-                    "properties": {},
-                },
-                outputSchema={
-                    "type": "array",
-                    "items": {"type": "string"},
-                    "description": "Array of JSON strings containing all stored key-value pairs or no data message",
-                    "examples": [
-                        '{"id": "list_55667788", "status": "success", "action": "list", "data": {"test_key": "test_value", "another_key": "another_value"}, "count": 2, "message": "Found 2 items", "formatted_list": "- test_key: test_value\\n- another_key: another_value", "timestamp": 1640995320}',
-                        '{"id": "list_99887766", "status": "empty", "action": "list", "data": {}, "count": 0, "message": "No data stored", "timestamp": 1640995320}',
-                    ],
-                },
-            ),
-        ]
+        logger.info("Listing tools for user: %s", user_id)
+
+        return _TOOLS
 
     @server.call_tool()
     async def handle_call_tool(
@@ -204,116 +411,31 @@ Sample system prompt
         Handle tool execution requests.
         Tools can modify server state and return responses.
         """
-        current_user = getattr(server, "user_id", None)
         logger.info(
-            f"User {current_user} calling tool: {name} with arguments: {arguments}"
+            "User %s calling tool: %s with arguments: %s", user_id, name, arguments
         )
+        now = int(time.time())
 
-        # Get API key for authentication (demonstrates API key usage)
+        # Get API key for authentication (demonstrates API key usage). Lookups
+        # are cached for _CREDS_TTL seconds, so revoked keys are still noticed
         try:
-            api_key = await get_simple_tools_credentials(
-                current_user, api_key=server.api_key
-            )
-            logger.info(f"Successfully retrieved API key for user {current_user}")
+            await get_simple_tools_credentials(user_id, api_key=server.api_key)
+            logger.info("Successfully retrieved API key for user %s", user_id)
         except ValueError as e:
-            return [
-                types.TextContent(
-                    type="text",
-                    text=f"Authentication error: {str(e)}",
-                )
-            ]
-
-        # Get user-specific data store
-        data_store = user_data_stores.get(current_user, {})
-
-        if name == "store_data":
-            if not arguments:
-                raise ValueError("Missing arguments")
-
-            key = arguments.get("key")
-            value = arguments.get("value")
-
-            if not key or not value:
-                raise ValueError("Missing key or value")
-
-            # Update user-specific server state
-            data_store[key] = value
-            # Ensure it's saved back to the global store
-            if current_user:
-                user_data_stores[current_user] = data_store
-
-            result = {
-                "id": f"store_{uuid.uuid4().hex[:8]}",
-                "status": "success",
-                "action": "store",
-                "key": key,
-                "value": value,
-                "message": f"Stored '{key}' with value: {value}",
-                "authenticated": True,
-                "timestamp": int(time.time()),
-            }
-
-            return [types.TextContent(type="text", text=json.dumps(result))]
-
-        elif name == "retrieve_data":
-            if not arguments:
-                raise ValueError("Missing arguments")
-
-            key = arguments.get("key")
-
-            if not key:
-                raise ValueError("Missing key")
-
-            if key not in data_store:
-                result = {
-                    "id": f"retrieve_{uuid.uuid4().hex[:8]}",
-                    "status": "not_found",
-                    "action": "retrieve",
-                    "key": key,
-                    "message": f"Key '{key}' not found",
-                    "timestamp": int(time.time()),
-                }
-            else:
-                result = {
-                    "id": f"retrieve_{uuid.uuid4().hex[:8]}",
-                    "status": "success",
-                    "action": "retrieve",
-                    "key": key,
-                    "value": data_store[key],
-                    "message": f"Value for '{key}': {data_store[key]}",
-                    "timestamp": int(time.time()),
-                }
-
-            return [types.TextContent(type="text", text=json.dumps(result))]
-
-        elif name == "list_data":
-            if not data_store:
-                result = {
-                    "id": f"list_{uuid.uuid4().hex[:8]}",
-                    "status": "empty",
-                    "action": "list",
-                    "data": {},
-                    "count": 0,
-                    "message": "No data stored",
-                    "timestamp": int(time.time()),
-                }
-            else:
-                result = {
-                    "id": f"list_{uuid.uuid4().hex[:8]}",
-                    "status": "success",
-                    "action": "list",
-                    "data": data_store,
-                    "count": len(data_store),
-                    "message": f"Found {len(data_store)} items",
-                    "formatted_list": "\n".join(
-                        [f"- {k}: {v}" for k, v in data_store.items()]
-                    ),
-                    "timestamp": int(time.time()),
-                }
-
-            return [types.TextContent(type="text", text=json.dumps(result))]
-
-        raise ValueError(f"Unknown tool: {name}")
+            return [_text(f"Authentication error: {str(e)}")]
+
+        # Get user-specific data store; anonymous callers get a throwaway one
+        if user_id:
+            data_store = user_data_stores.setdefault(user_id, {})
+        else:
+            data_store = {}
+
+        handler = _TOOL_HANDLERS.get(name)
+        if handler is None:
+            raise ValueError(f"Unknown tool: {name}")
+
+        result = handler(data_store, arguments, now)
+        return [_text(_dumps(result))]
 
     return server
 
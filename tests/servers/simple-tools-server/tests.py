@@ -1,6 +1,17 @@
+import importlib.util
+from pathlib import Path
+
 import pytest
 from tests.utils.test_tools import get_test_id, run_tool_test
 
+SERVER_FILE = (
+    Path(__file__).resolve().parents[3]
+    / "src"
+    / "servers"
+    / "simple-tools-server"
+    / "main.py"
+)
+
 
 # Shared context dictionary at module level
 SHARED_CONTEXT = {}
@@ -61,3 +72,33 @@ def context():
 @pytest.mark.asyncio
 async def test_simple_tools_tool(client, context, test_config):
     return await run_tool_test(client, context, test_config)
+
+
+def load_server_module():
+    """Load the simple-tools server module by path, as local.py does"""
+    spec = importlib.util.spec_from_file_location("simple-tools.server", SERVER_FILE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_user_data_store_eviction():
+    store = load_server_module()._LRUStore(2)
+
+    store.setdefault("a", {})
+    store.setdefault("b", {})
+    # Touching "a" makes "b" the least recently used entry
+    store.setdefault("a", {})
+    store.setdefault("c", {})
+
+    assert list(store) == ["a", "c"]
+
+
+@pytest.mark.parametrize(
+    "raw, expected", [("5", 5), ("0", 1), ("-3", 1), ("lots", 10000)]
+)
+def test_max_users_from_env(monkeypatch, raw, expected):
+    module = load_server_module()
+    monkeypatch.setenv("SIMPLE_TOOLS_MAX_USERS", raw)
+
+    assert module._max_users_from_env() == expected